@@ -2,16 +2,23 @@ import numpy as np
 import pandas as pd
 from mbi import Domain, Dataset
 import itertools
+import functools
+from concurrent.futures import ThreadPoolExecutor
 
 def powerset(iterable):
     s = list(iterable)
     return itertools.chain.from_iterable(itertools.combinations(s, r) for r in range(1,len(s)+1))
 
 def downward_closure(cliques):
-    ans = set()
+    # subsets are enumerated as bitmasks over each clique, and deduplicated
+    # with an insertion-ordered dict so the result is deterministic
+    ans = {}
     for proj in cliques:
-        ans.update(powerset(proj))
-    return list(sorted(ans, key=len))
+        proj = tuple(proj)
+        n = len(proj)
+        for m in range(1, 1 << n):
+            ans[tuple(proj[i] for i in range(n) if m >> i & 1)] = None
+    return sorted(ans, key=len)
 
 BINS = {
     "fare": np.r_[-1, np.arange(0, 100, step=10), 9900],
@@ -20,51 +27,136 @@ BINS = {
     "trip_seconds": np.r_[-1, np.arange(0, 2000, step=200), 86400],
     "trip_miles": np.r_[-1, np.arange(0, 100, step=10), 1428] }
 
+def midpoints(edges):
+    """ Compute the value that each bin is mapped back to by undo_discretize,
+    narrowing the first and last bins (which are open-ended in practice).
+
+    :param edges: the sorted edges of the bins
+    :returns: a numpy array with the midpoint of each bin
+    """
+    low = edges[:-1].copy()
+    high = edges[1:].copy()
+    low[0] = low[1]-2
+    high[-1] = high[-2]+2
+    return (low + high) / 2
+
+MIDPOINTS = { col : midpoints(BINS[col]) for col in BINS }
+
+def bin_codes(x, edges):
+    """ Find the bin [edges[i], edges[i+1]) that each value of x falls in,
+    vectorized with numpy; this is the same guess-and-correct search as
+    bin_columns in extensions/transform.py, so change the two together.
+
+    :param x: a numpy array of values
+    :param edges: the sorted edges of the bins
+    :returns: the index of the bin of each value; values below the first edge or
+        at/above the last edge are put in the first or last bin, and NaN in -1
+    """
+    inner = edges[1:-1]
+    if len(inner) < 2 or inner[-1] == inner[0]:
+        codes = np.searchsorted(inner, x, side='right')
+    else:
+        last = len(edges) - 2
+        scale = (len(inner) - 1) / (inner[-1] - inner[0])
+        with np.errstate(invalid='ignore'):
+            codes = np.floor((x - inner[0]) * scale).astype(np.int64)
+        codes += 1
+        np.clip(codes, 0, last, out=codes)
+        while True:
+            below = (x < edges[codes]) & (codes > 0)
+            above = (x >= edges[codes + 1]) & (codes < last)
+            if not (below.any() or above.any()):
+                break
+            codes -= below
+            codes += above
+    if x.dtype.kind == 'f':
+        codes[np.isnan(x)] = -1
+    return codes
+
+def code_dtype(n):
+    """ Copy of code_dtype in extensions/transform.py (this directory doesn't
+    import from the extensions); change the two together """
+    for dtype in (np.int8, np.int16, np.int32):
+        if n - 1 <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+@functools.lru_cache(maxsize=256)
+def values_index(values):
+    """ Copy of values_index in extensions/transform.py; change the two
+    together """
+    return pd.Index(list(values))
+
+def discretize_column(x, col, info):
+    """ Transform a column to codes.
+
+    :param x: the column, as a pd.Series
+    :param col: the name of the column
+    :param info: the schema of the column
+    :returns: the codes, and the size of the domain of the column
+    """
+    if col in BINS:
+        size = len(BINS[col]) - 1
+        codes = bin_codes(x.to_numpy(), BINS[col])
+    elif 'values' in info:
+        # look the values up directly; anything else is coded -1
+        size = len(info['values'])
+        codes = values_index(tuple(info['values'])).get_indexer(x)
+    else:
+        return x.to_numpy() - info['min'], info['max'] - info['min'] + 1
+    return codes.astype(code_dtype(size), copy=False), size
+
+@functools.lru_cache(maxsize=32)
+def cached_domain(items):
+    """ Build the mbi.Domain with the given (attribute, size) pairs, in order,
+    sharing it between the datasets discretized with the same schema """
+    return Domain.fromdict(dict(items))
+
 def discretize(df, schema, clip=None):
     weights = None
     if clip is not None:
         # each individual now only contributes "clip" records
         # achieved by reweighting records, rather than resampling them
-        weights = df.taxi_id.value_counts()
+        ids, uniques = pd.factorize(df.taxi_id.to_numpy())
+        known = ids >= 0
+        weights = np.bincount(ids[known], minlength=len(uniques))
         weights = np.minimum(clip/weights, 1.0)
-        weights = np.array(df.taxi_id.map(weights).values)
+        weights = np.where(known, weights[ids], np.nan)
 
-    new = df.copy()
+    # collect the columns and build the data frame once at the end, rather
+    # than updating a copy of df one column at a time; columns that are not
+    # transformed are shared with df rather than copied
+    new = { col : df[col].to_numpy() for col in df.columns }
     domain = { }
-    for col in schema:
-        info = schema[col]
-        #print(col)
-        if col in BINS:
-            new[col] = pd.cut(df[col], BINS[col], right=False).cat.codes
-            domain[col] = len(BINS[col]) - 1
-        elif 'values' in info:
-            new[col] = df[col].astype(pd.CategoricalDtype(info['values'])).cat.codes
-            domain[col] = len(info['values'])
-        else:
-            new[col] = df[col] - info['min']
-            domain[col] = info['max'] - info['min'] + 1
+    # the columns are independent, and numpy/pandas release the GIL for most
+    # of the work, so transform them in threads
+    with ThreadPoolExecutor() as executor:
+        results = executor.map(
+                lambda col: discretize_column(df[col], col, schema[col]), schema)
+        for col, (codes, size) in zip(schema, results):
+            new[col] = codes
+            domain[col] = size
 
-    domain = Domain.fromdict(domain)
-    return Dataset(new, domain, weights)
+    domain = cached_domain(tuple(domain.items()))
+    return Dataset(pd.DataFrame(new, index=df.index, copy=False), domain, weights)
 
 def undo_discretize(dataset, schema):
     df = dataset.df
-    new = df.copy()
+    new = { col : df[col].to_numpy() for col in df.columns }
 
     for col in dataset.domain:
         info = schema[col]
         if col in BINS:
-            low = BINS[col][:-1]; 
-            high = BINS[col][1:]
-            low[0] = low[1]-2
-            high[-1] = high[-2]+2
-            mid = (low + high) / 2
-            new[col] = mid[df[col].values]
+            # cast the few midpoints, rather than the column they are mapped
+            # to; codes outside of the domain are clipped to it, so the gather
+            # needs no bounds checks
+            mid = MIDPOINTS[col].astype(schema[col]['dtype'])
+            new[col] = np.take(mid, df[col].to_numpy(), mode='clip')
         elif 'values' in info:
             mapping = np.array(info['values'])
-            new[col] = mapping[df[col].values]
+            new[col] = np.take(mapping, df[col].to_numpy(), mode='clip')
         else:
-            new[col] = df[col] + info['min']
+            new[col] = df[col].to_numpy() + info['min']
 
         #if 'max' in info:
         #    new[col] = np.minimum(new[col], info['max'])
@@ -73,8 +165,50 @@ def undo_discretize(dataset, schema):
 
     dtypes = { col : schema[col]['dtype'] for col in schema }
 
-    return new.astype(dtypes)
+    # binned columns already have their dtype, so only the others are cast
+    return pd.DataFrame(new, index=df.index, copy=False).astype(dtypes, copy=False)
+
 
+def column_codes(dataset):
+    """ Get the codes of every column of an mbi.Dataset as int64 arrays, along
+    with, for the columns that have codes outside of their domain, a mask of
+    the records that are inside it (Dataset.datavector ignores the others).
+    """
+    codes = { }
+    valid = { }
+    for col in dataset.domain.attrs:
+        x = dataset.df[col].to_numpy().astype(np.int64)
+        ok = (x >= 0) & (x < dataset.domain.size(col))
+        if not ok.all():
+            valid[col] = ok
+        codes[col] = x
+    return codes, valid
+
+def cell_index(codes, valid, attrs, shape, idx=None, keep=None):
+    """ Compute the flat index of each record's cell in the marginal on attrs,
+    optionally extending the index (and mask) already computed for a marginal
+    on some other attributes, which then come first.
+
+    :returns: the index of each record, and a mask of the records to count
+        (or None if all of them are)
+    """
+    if idx is None:
+        idx = np.zeros(len(codes[attrs[0]]), dtype=np.int64)
+    for col, n in zip(attrs, shape):
+        idx = idx*n + codes[col]
+        if col in valid:
+            keep = valid[col] if keep is None else keep & valid[col]
+    return idx, keep
+
+def cell_counts(idx, keep, weights, shape):
+    """ Compute the (weighted) number of records in each cell of a marginal,
+    like Dataset.project(...).datavector(flatten=False), from the index given
+    by cell_index """
+    if keep is not None:
+        idx = idx[keep]
+        weights = None if weights is None else weights[keep]
+    counts = np.bincount(idx, weights=weights, minlength=int(np.prod(shape)))
+    return counts.astype(float).reshape(shape)
 
 def score(real, synth):
     # Replicate the NIST scoring metric
@@ -91,22 +225,38 @@ def score(real, synth):
 
     idx = np.argsort(real.project('pickup_community_area').datavector())
 
+    # rather than projecting the datasets onto every 4-way marginal, find the
+    # cell of each record in the (community area, shift) marginal once, extend
+    # it with the first attribute of the pairs once per attribute (the pairs
+    # come grouped by it), and only add the second attribute for each pair
+    real_codes, real_valid = column_codes(real)
+    synth_codes, synth_valid = column_codes(synth)
+    real_keys = cell_index(real_codes, real_valid, proj, keys.shape)
+    synth_keys = cell_index(synth_codes, synth_valid, proj, keys.shape)
+
     overall = 0
     breakdown = {}
     breakdown2 = np.zeros(dom.size('pickup_community_area'))
 
-    for pair in pairs:
-        #print(pair)
-        proj = ('pickup_community_area','shift') + pair
-        X = real.project(proj).datavector(flatten=False)
-        Y = synth.project(proj).datavector(flatten=False)
-        X /= X.sum(axis=(2,3), keepdims=True)
-        Y /= Y.sum(axis=(2,3), keepdims=True)
+    for a, group in itertools.groupby(pairs, key=lambda pair: pair[0]):
+        size = (dom.size(a),)
+        real_a = cell_index(real_codes, real_valid, (a,), size, *real_keys)
+        synth_a = cell_index(synth_codes, synth_valid, (a,), size, *synth_keys)
+        for pair in group:
+            #print(pair)
+            b = pair[1]
+            shape = keys.shape + dom.project(pair).shape
+            X = cell_counts(*cell_index(real_codes, real_valid, (b,), shape[3:],
+                    *real_a), real.weights, shape)
+            Y = cell_counts(*cell_index(synth_codes, synth_valid, (b,), shape[3:],
+                    *synth_a), synth.weights, shape)
+            X /= X.sum(axis=(2,3), keepdims=True)
+            Y /= Y.sum(axis=(2,3), keepdims=True)
 
-        err = np.nan_to_num( np.abs(X-Y).sum(axis=(2,3)), nan=2.0)
-        breakdown[pair] = err.mean()
-        breakdown2 += err.mean(axis=1)
-        overall += err.mean()
+            err = np.nan_to_num( np.abs(X-Y).sum(axis=(2,3)), nan=2.0)
+            breakdown[pair] = err.mean()
+            breakdown2 += err.mean(axis=1)
+            overall += err.mean()
 
     score = overall / len(pairs)
 
@@ -114,4 +264,3 @@ def score(real, synth):
     breakdown2 /= len(pairs)
 
     return nist_score, pd.Series(breakdown), (2.0 - breakdown2[idx]) / 2.0
-
@@ -1,14 +1,16 @@
 import numpy as np
 import pandas as pd
 import json
+import functools
 from mbi import FactoredInference, Factor, Dataset, Domain
 from scipy import sparse
-from scipy.special import logsumexp
 import itertools
 import networkx as nx
-from disjoint_set import DisjointSet
+from numba import njit
 from cdp2adp import cdp_rho
 import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
 
 
 def powerset(iterable):
@@ -43,12 +45,94 @@ def downward_closure(cliques):
 
     Example:
         >>> downward_closure([[1,2],[2,3]])
-        [(2,), (1,), (3,), (1, 2), (2, 3)]
+        [(1,), (2,), (3,), (1, 2), (2, 3)]
     """
-    ans = set()
+    # subsets are enumerated as bitmasks over each clique, and deduplicated
+    # with an insertion-ordered dict so the result is deterministic
+    ans = {}
     for proj in cliques:
-        ans.update(powerset(proj))
-    return list(sorted(ans, key=len))
+        proj = tuple(proj)
+        n = len(proj)
+        for m in range(1, 1 << n):
+            ans[tuple(proj[i] for i in range(n) if m >> i & 1)] = None
+    return sorted(ans, key=len)
+
+
+@njit(cache=True, fastmath=True, nogil=True)
+def csr_matvec(data, indices, indptr, x, out):
+    """Accumulates the product of a CSR matrix and a dense vector into ``out``.
+    Operating on the raw CSR arrays avoids the dispatch and temporary
+    allocation of ``Q @ x``, which dominate for the small matrices used here.
+
+    Args:
+        data (ndarray): ``data`` array of the CSR matrix.
+        indices (ndarray): ``indices`` array of the CSR matrix.
+        indptr (ndarray): ``indptr`` array of the CSR matrix.
+        x (ndarray): Dense vector with one entry per column.
+        out (ndarray): Dense vector with one entry per row, updated in place.
+    """
+    for i in range(len(indptr) - 1):
+        s = 0.0
+        for k in range(indptr[i], indptr[i + 1]):
+            s += data[k] * x[indices[k]]
+        out[i] += s
+
+
+@njit(cache=True, fastmath=True, nogil=True)
+def csr_rmatvec(data, indices, indptr, x, out):
+    """Accumulates the product of the transpose of a CSR matrix and a dense
+    vector into ``out``, without materializing the transpose.
+
+    Args:
+        data (ndarray): ``data`` array of the CSR matrix.
+        indices (ndarray): ``indices`` array of the CSR matrix.
+        indptr (ndarray): ``indptr`` array of the CSR matrix.
+        x (ndarray): Dense vector with one entry per row.
+        out (ndarray): Dense vector with one entry per column, updated in place.
+    """
+    for i in range(len(indptr) - 1):
+        for k in range(indptr[i], indptr[i + 1]):
+            out[indices[k]] += data[k] * x[i]
+
+
+@njit(cache=True, nogil=True)
+def find_roots(parent, nodes):
+    """Finds the union-find root of each node, compressing paths in place.
+
+    Args:
+        parent (ndarray): Parent of each node; roots are their own parent.
+        nodes (ndarray): Nodes to look up.
+
+    Returns:
+        ndarray: The root of each node in ``nodes``.
+    """
+    roots = np.empty_like(nodes)
+    for i in range(len(nodes)):
+        root = nodes[i]
+        while parent[root] != root:
+            root = parent[root]
+        x = nodes[i]
+        while parent[x] != root:
+            parent[x], x = root, parent[x]
+        roots[i] = root
+    return roots
+
+
+def cache_transpose(Q):
+    """Attaches a CSR copy of ``Q.T`` to ``Q``, a trick to improve the
+    efficiency of Private-PGM, which repeatedly multiplies by the transpose.
+    The lazy transpose of a CSR matrix is a CSC matrix sharing the same
+    arrays, so it is converted directly rather than through the generic
+    ``csr_matrix`` constructor.
+
+    Args:
+        Q (scipy.sparse.csr_matrix): Measurement matrix.
+
+    Returns:
+        scipy.sparse.csr_matrix: ``Q``, with ``Q.T`` replaced by a CSR matrix.
+    """
+    Q.T = Q.T.tocsr()
+    return Q
 
 
 def get_permutation_matrix(cl1, cl2, domain):
@@ -98,7 +182,8 @@ def get_permutation_matrix(cl1, cl2, domain):
             of each variable in the domain.
 
     Returns:
-        scipy.sparse.csr_matrix: Sparse permutation matrix.
+        scipy.sparse.csr_matrix: Sparse permutation matrix. Results are cached
+            and shared between calls, so the matrix must not be modified.
 
     Example:
         >>> domain = Domain(attrs=[1,2],shape=[2,2])
@@ -109,15 +194,83 @@ def get_permutation_matrix(cl1, cl2, domain):
                 [0., 0., 0., 1.]])
     """
     assert set(cl1) == set(cl2)
-    n = domain.size(cl1)
-    fac = Factor(domain.project(cl1), np.arange(n))
+    # mbi.Domain is not hashable, so the cache is keyed on the shape instead
+    return _permutation_matrix(tuple(cl1), tuple(cl2), domain.project(cl1).shape)
+
+
+@functools.lru_cache(maxsize=None)
+def _permutation_matrix(cl1, cl2, shape):
+    n = int(np.prod(shape))
+    fac = Factor(Domain(cl1, shape), np.arange(n))
     new = fac.transpose(cl2)
-    data = np.ones(n)
+    data = np.ones(n, dtype=np.float32)
     row_ind = fac.datavector()
     col_ind = new.datavector()
     return sparse.csr_matrix((data, (row_ind, col_ind)), shape=(n, n))
 
 
+def max_col_sqsum(Q):
+    """Returns the largest squared L2 norm of any column of ``Q``, computed in
+    one pass over the CSR arrays rather than by building ``Q.power(2)``.
+
+    Args:
+        Q (scipy.sparse.csr_matrix): Measurement matrix.
+
+    Returns:
+        float: Maximum over columns of the sum of squared entries.
+    """
+    d = Q.data
+    return np.bincount(Q.indices, weights=d * d, minlength=Q.shape[1]).max()
+
+
+def vstack_csr(A, B):
+    """Stacks two CSR matrices vertically by concatenating their arrays,
+    skipping the format detection and conversion of ``sparse.vstack``.
+
+    Args:
+        A (scipy.sparse.csr_matrix): Top matrix.
+        B (scipy.sparse.csr_matrix): Bottom matrix, with as many columns as ``A``.
+
+    Returns:
+        scipy.sparse.csr_matrix: The matrix ``[A; B]``.
+    """
+    assert A.shape[1] == B.shape[1]
+    data = np.concatenate([A.data, B.data])
+    indices = np.concatenate([A.indices, B.indices])
+    indptr = np.concatenate([A.indptr, B.indptr[1:] + A.indptr[-1]])
+    return sparse.csr_matrix(
+        (data, indices, indptr), shape=(A.shape[0] + B.shape[0], A.shape[1])
+    )
+
+
+def kron_ones_times_perm(Qc, P, a_size):
+    """Computes ``sparse.kron(np.ones(a_size), Qc) @ P`` without materializing
+    the Kronecker product. The Kronecker product with a row of ones is
+    ``a_size`` copies of ``Qc`` stacked horizontally, and right-multiplying by
+    a permutation matrix only relabels columns, so the result can be built
+    directly from the CSR arrays of ``Qc`` and ``P``.
+
+    Args:
+        Qc (scipy.sparse.csr_matrix): Measurement matrix of a child clique.
+        P (scipy.sparse.csr_matrix): Permutation matrix, as returned by
+            ``get_permutation_matrix``.
+        a_size (int): Number of horizontal copies of ``Qc``.
+
+    Returns:
+        scipy.sparse.csr_matrix: Sparse matrix equal to
+            ``sparse.kron(np.ones(a_size), Qc) @ P``.
+    """
+    Qc = sparse.csr_matrix(Qc)
+    offsets = np.arange(a_size) * Qc.shape[1]
+    # each entry of Qc expands to a_size consecutive entries of the same row
+    cols = (Qc.indices[:, None] + offsets[None, :]).ravel()
+    data = np.repeat(Qc.data, a_size)
+    indptr = Qc.indptr * a_size
+    return sparse.csr_matrix(
+        (data, P.indices[cols], indptr), shape=(Qc.shape[0], P.shape[1])
+    )
+
+
 def get_aggregate(cl, matrices, domain):
     """Returns additional measurement matrices by taking the Kronecker
     product between Identity and previous measurements.
@@ -134,15 +287,14 @@ def get_aggregate(cl, matrices, domain):
             measurements.
     """
     children = [r for r in matrices if set(r) < set(cl) and len(r) + 1 == len(cl)]
-    ans = [sparse.csr_matrix((0, domain.size(cl)))]
+    ans = [sparse.csr_matrix((0, domain.size(cl)), dtype=np.float32)]
     for c in children:
-        coef = 1.0 / np.sqrt(len(children))
+        coef = np.float32(1.0 / np.sqrt(len(children)))
         a = tuple(set(cl) - set(c))
         cl2 = a + c
         Qc = matrices[c]
         P = get_permutation_matrix(cl, cl2, domain)
-        T = np.ones(domain.size(a))
-        Q = sparse.kron(T, Qc) @ P
+        Q = kron_ones_times_perm(Qc, P, domain.size(a))
         ans.append(coef * Q)
     return sparse.vstack(ans)
 
@@ -159,23 +311,127 @@ def get_identity(cl, post_plausibility, domain):
             of each variable in the domain
 
     Returns:
-        scipy.sparse.csr_matrix: Sparse matrix object where cells identified as
-        probably containing counts above threshold have value 1.
+        scipy.sparse.csr_matrix: Sparse matrix object with one row per cell
+        identified as probably containing counts above threshold, which has
+        value 1 in that cell's column.
     """
     children = [
         r for r in post_plausibility if set(r) < set(cl) and len(r) + 1 == len(cl)
     ]
-    plausibility = Factor.ones(domain.project(cl))
+    # post_plausibility holds boolean factors, so the product of the children
+    # is computed as a bitmap AND instead of a float multiplication
+    dom = domain.project(cl)
+    plausibility = np.ones(dom.shape, dtype=bool)
     for c in children:
-        plausibility *= post_plausibility[c]
+        plausibility &= post_plausibility[c].expand(dom).values
 
-    row_ind = col_ind = np.nonzero(plausibility.datavector())[0]
-    data = np.ones_like(row_ind)
+    # rows are only created for plausible cells, so Q needs no compaction
+    col_ind = np.flatnonzero(plausibility)
+    k = col_ind.size
     n = domain.size(cl)
-    Q = sparse.csr_matrix((data, (row_ind, col_ind)), (n, n))
+    data = np.ones(k, dtype=np.float32)
+    Q = sparse.csr_matrix((data, col_ind, np.arange(k + 1)), shape=(k, n))
     return Q
 
 
+def get_measurement(cl, post_plausibility, matrices, domain):
+    """Builds the measurement matrix for a clique, combining fine-granularity
+    measurements of the plausible cells with aggregate measurements of the
+    remaining cells.
+
+    Args:
+        cl (iterable): A clique marginal.
+        post_plausibility (dict): Dictionary of previously taken measurements.
+            The key is the clique and value is a Factor object.
+        matrices (dict): A dictionary of measurement matrices where the key is
+            the clique and the value is the matrix.
+        domain (mbi.Domain): A mbi Domain object which holds the shape and names
+            of each variable in the domain.
+
+    Returns:
+        tuple: The fine-granularity matrix ``Q1`` and the full measurement
+            matrix ``Q``, whose first ``Q1.shape[0]`` rows are ``Q1``. ``Q``
+            has no rows if there is nothing left to measure.
+    """
+    Q1 = get_identity(
+        cl, post_plausibility, domain
+    )  # get fine-granularity measurements
+    Q2 = get_aggregate(cl, matrices, domain)  # get remaining aggregate measurements
+    # restrict Q2 to the cells not measured by Q1, i.e. Q2 @ (I - Q1.T @ Q1),
+    # by dropping the entries in plausible columns
+    plausible = np.zeros(domain.size(cl), dtype=bool)
+    plausible[Q1.indices] = True
+    Q2.data[plausible[Q2.indices]] = 0
+    Q2.eliminate_zeros()
+    if Q1.shape[0] == 0 and Q2.shape[0] == 0:
+        # nothing left to measure for this clique
+        return Q1, Q2
+    Q = vstack_csr(Q1, Q2)
+    cache_transpose(Q)
+    return Q1, Q
+
+
+def report_measurement(cl, Q):
+    """Prints the clique about to be measured and the L2 sensitivity of its
+    measurement matrix (which is 1 by construction).
+
+    Args:
+        cl (iterable): A clique marginal.
+        Q (scipy.sparse.csr_matrix): Measurement matrix for ``cl``.
+    """
+    print(
+        "Measuring %s, L2 sensitivity %.6f"
+        % (cl, np.sqrt(max_col_sqsum(Q)))
+    )
+
+
+def marginal(records, weights, axes, shape):
+    """Computes a flattened marginal of a record matrix with a single
+    ``np.bincount``, equivalent to ``data.project(cl).datavector()`` but
+    without going through the DataFrame for every clique.
+
+    Args:
+        records (ndarray): Integer record matrix with one column per attribute.
+        weights (ndarray): Weight of each record, or ``None``.
+        axes (tuple): Columns of ``records`` that make up the marginal.
+        shape (tuple): Domain size of each of those columns.
+
+    Returns:
+        ndarray: The marginal counts, flattened in C order. Records with a
+            code outside of the domain (such as ``-1`` for a missing value)
+            are not counted, as in ``Dataset.datavector``.
+    """
+    values = records[:, axes]
+    valid = ((values >= 0) & (values < np.array(shape))).all(axis=1)
+    if not valid.all():
+        values = values[valid]
+        weights = None if weights is None else weights[valid]
+    flat = np.ravel_multi_index(values.T, shape)
+    return np.bincount(flat, weights=weights, minlength=int(np.prod(shape)))
+
+
+def measure(records, weights, domain, cl, Q, y):
+    """Adds ``Q @ mu`` to the noise vector ``y`` in place, where ``mu`` is the
+    ``cl`` marginal of the sensitive data.
+
+    Args:
+        records (ndarray): The sensitive records, with columns in the order of
+            ``domain.attrs``.
+        weights (ndarray): Weight of each record, or ``None``.
+        domain (mbi.Domain): A mbi Domain object which holds the shape and names
+            of each variable in the domain.
+        cl (iterable): A clique marginal.
+        Q (scipy.sparse.csr_matrix): Measurement matrix for ``cl``.
+        y (ndarray): Noise vector with one entry per row of ``Q``.
+    """
+    #########################################
+    ### This code uses the sensitive data ###
+    #########################################
+    mu = marginal(records, weights, domain.axes(cl), domain.project(cl).shape)
+    csr_matvec(Q.data, Q.indices, Q.indptr, mu.astype(np.float32), y)
+    #########################################
+
+
 def exponential_mechanism(q, eps, sensitivity, prng=np.random, monotonic=False):
     """Performs the exponential mechanism. Returned results satisfy eps-DP.
 
@@ -194,8 +450,11 @@ def exponential_mechanism(q, eps, sensitivity, prng=np.random, monotonic=False):
     if eps == np.inf:
         eps = np.finfo(np.float64).max
     coef = 1.0 if monotonic else 0.5
+    # scores are shifted so their max is 0, so exp cannot overflow and the
+    # normalization can be done in a single pass without logsumexp
     scores = coef * eps / sensitivity * (q - q.max())
-    probas = np.exp(scores - logsumexp(scores))
+    probas = np.exp(scores, out=scores)
+    probas /= probas.sum()
     return prng.choice(q.size, p=probas)
 
 
@@ -216,26 +475,40 @@ def select(data, model, rho, targets=[]):
     Returns:
         List of additional measurements selected by the algorithm.
     """
-    weights = {}
-    candidates = list(itertools.combinations(data.domain.invert(targets), 2))
-    for a, b in candidates:
-        xhat = model.project([a, b] + targets).datavector()
+    attrs = data.domain.invert(targets)
+    candidates = list(itertools.combinations(attrs, 2))
+    weights = np.empty(len(candidates))
+    for i, (a, b) in enumerate(candidates):
+        # datavector() returns a fresh array, so the L1 error can be computed
+        # in place without the temporaries allocated by np.linalg.norm
         x = data.project([a, b] + targets).datavector()
-        weights[a, b] = np.linalg.norm(x - xhat, 1)
-
-    T = nx.Graph()
-    T.add_nodes_from(data.domain.attrs)
-    ds = DisjointSet()
+        xhat = model.project([a, b] + targets).datavector()
+        np.subtract(x, xhat, out=x)
+        weights[i] = np.abs(x, out=x).sum()
+
+    # union-find over attribute indices, so connected candidates can be
+    # filtered with a single vectorized comparison per iteration
+    index = {a: i for i, a in enumerate(attrs)}
+    edges = np.array(
+        [(index[a], index[b]) for a, b in candidates], dtype=np.int64
+    ).reshape(-1, 2)
+    parent = np.arange(len(attrs))
+    chosen = []
 
     r = len(data.domain) - len(targets)
     epsilon = np.sqrt(8 * rho / (r - 1))
     for i in range(r - 1):
-        candidates = [e for e in candidates if not ds.connected(*e)]
-        wgts = np.array([weights[e] for e in candidates])
-        idx = exponential_mechanism(wgts, epsilon, sensitivity=1.0)
-        e = candidates[idx]
-        T.add_edge(*e)
-        ds.union(*e)
+        live = np.flatnonzero(
+            find_roots(parent, edges[:, 0]) != find_roots(parent, edges[:, 1])
+        )
+        idx = live[exponential_mechanism(weights[live], epsilon, sensitivity=1.0)]
+        u, v = find_roots(parent, edges[idx])
+        parent[u] = v
+        chosen.append(candidates[idx])
+
+    T = nx.Graph()
+    T.add_nodes_from(data.domain.attrs)
+    T.add_edges_from(chosen)
 
     return [e + tuple(targets) for e in T.edges]
 
@@ -258,6 +531,8 @@ def adagrid(data, epsilon, delta, threshold, targets=[], split_strategy=None, **
             fraction of the zCDP budget allocated to each step of the algorithm.
         mbi_args (kwargs): Args to pass to mbi.FactoredInference. Please refer
             to the comments within this class to determine which parameters to pass.
+            If ``warm_start`` is set, the final estimate runs for half of
+            ``iters``, starting from the model fit after step 1.
 
     Returns:
         mbi.Dataset: Dataset object holding synthetic dataset satisfying
@@ -282,39 +557,49 @@ def adagrid(data, epsilon, delta, threshold, targets=[], split_strategy=None, **
     step1_all = downward_closure(step1_outer)
     step1_sigma = np.sqrt(0.5 / rho_step_1) * np.sqrt(len(step1_all))
 
-    # Step 1: Measure all 1-way marginals involving target(s)
-    for k in range(1, len(targets) + 2):
-        split = [cl for cl in step1_all if len(cl) == k]
-        print()
-        for cl in split:
-            I = sparse.eye(domain.size(cl))
-            Q1 = get_identity(
-                cl, post_plausibility, domain
-            )  # get fine-granularity measurements
-            Q2 = get_aggregate(cl, matrices, domain) @ (
-                I - Q1
-            )  # get remaining aggregate measurements
-            Q1 = Q1[Q1.getnnz(1) > 0]  # remove all-zero rows
-            Q = sparse.vstack([Q1, Q2])
-            Q.T = sparse.csr_matrix(Q.T)  # a trick to improve efficiency of Private-PGM
-            # Q has sensitivity 1 by construction
-            print(
-                "Measuring %s, L2 sensitivity %.6f"
-                % (cl, np.sqrt(Q.power(2).sum(axis=0).max()))
-            )
-            #########################################
-            ### This code uses the sensitive data ###
-            #########################################
-            mu = data.project(cl).datavector()
-            y = Q @ mu + np.random.normal(loc=0, scale=step1_sigma, size=Q.shape[0])
-            #########################################
-            est = Q1.T @ y[: Q1.shape[0]]
-
-            post_plausibility[cl] = Factor(
-                domain.project(cl), est >= step1_sigma * threshold
-            )
-            matrices[cl] = Q
-            measurements.append((Q, y, 1.0, cl))
+    # the record matrix is extracted once so that every marginal can be
+    # computed without re-reading the DataFrame
+    records = data.df[list(domain.attrs)].to_numpy()
+
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        # Step 1: Measure all 1-way marginals involving target(s)
+        for k in range(1, len(targets) + 2):
+            split = [cl for cl in step1_all if len(cl) == k]
+            print()
+            # cliques of the same size only depend on smaller cliques, so they
+            # are measured concurrently and the noise is drawn at once
+            Qs = list(executor.map(
+                lambda cl: get_measurement(cl, post_plausibility, matrices, domain), split
+            ))
+            # skip cliques with nothing left to measure; none of their cells
+            # can be plausible
+            for cl, (_, Q) in zip(split, Qs):
+                if Q.shape[0] == 0:
+                    post_plausibility[cl] = Factor(
+                        domain.project(cl), np.zeros(domain.size(cl), dtype=bool)
+                    )
+                    matrices[cl] = Q
+            split = [cl for cl, (_, Q) in zip(split, Qs) if Q.shape[0] > 0]
+            Qs = [(Q1, Q) for Q1, Q in Qs if Q.shape[0] > 0]
+            for cl, (_, Q) in zip(split, Qs):
+                report_measurement(cl, Q)
+            noise = np.random.normal(
+                loc=0, scale=step1_sigma, size=sum(Q.shape[0] for _, Q in Qs)
+            ).astype(np.float32)
+            ys = np.split(noise, np.cumsum([Q.shape[0] for _, Q in Qs])[:-1])
+            list(executor.map(
+                lambda cl, Q, y: measure(records, data.weights, domain, cl, Q, y),
+                split, [Q for _, Q in Qs], ys,
+            ))
+            for cl, (Q1, Q), y in zip(split, Qs, ys):
+                est = np.zeros(Q1.shape[1])
+                csr_rmatvec(Q1.data, Q1.indices, Q1.indptr, y[: Q1.shape[0]], est)
+
+                post_plausibility[cl] = Factor(
+                    domain.project(cl), est >= step1_sigma * threshold
+                )
+                matrices[cl] = Q
+                measurements.append((Q, y, 1.0, cl))
 
     engine = FactoredInference(domain, log=False, **mbi_args)
     engine.estimate(measurements)
@@ -325,33 +610,34 @@ def adagrid(data, epsilon, delta, threshold, targets=[], split_strategy=None, **
     print()
     # step 3: measure those marginals
     step3_sigma = np.sqrt(len(step2_queries)) * np.sqrt(0.5 / rho_step_3)
-    for cl in step2_queries:
-        I = sparse.eye(domain.size(cl))
-        Q1 = get_identity(
-            cl, post_plausibility, domain
-        )  # get fine-granularity measurements
-        Q2 = get_aggregate(cl, matrices, domain) @ (
-            I - Q1
-        )  # get remaining aggregate measurements
-        Q1 = Q1[Q1.getnnz(1) > 0]  # remove all-zero rows
-        Q = sparse.vstack([Q1, Q2])
-        Q.T = sparse.csr_matrix(Q.T)  # a trick to improve efficiency of Private-PGM
-        # Q has sensitivity 1 by construction
-        print(
-            "Measuring %s, L2 sensitivity %.6f"
-            % (cl, np.sqrt(Q.power(2).sum(axis=0).max()))
-        )
-        #########################################
-        ### This code uses the sensitive data ###
-        #########################################
-        mu = data.project(cl).datavector()
-        y = Q @ mu + np.random.normal(loc=0, scale=step3_sigma, size=Q.shape[0])
-        #########################################
-
-        measurements.append((Q, y, 1.0, cl))
+    # step 3 does not update post_plausibility or matrices, so every clique
+    # is measured concurrently and the noise is drawn at once
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        Qs = list(executor.map(
+            lambda cl: get_measurement(cl, post_plausibility, matrices, domain)[1],
+            step2_queries,
+        ))
+        step2_queries = [cl for cl, Q in zip(step2_queries, Qs) if Q.shape[0] > 0]
+        Qs = [Q for Q in Qs if Q.shape[0] > 0]
+        for cl, Q in zip(step2_queries, Qs):
+            report_measurement(cl, Q)
+        noise = np.random.normal(
+            loc=0, scale=step3_sigma, size=sum(Q.shape[0] for Q in Qs)
+        ).astype(np.float32)
+        ys = np.split(noise, np.cumsum([Q.shape[0] for Q in Qs])[:-1])
+        list(executor.map(
+            lambda cl, Q, y: measure(records, data.weights, domain, cl, Q, y),
+            step2_queries, Qs, ys,
+        ))
+        measurements.extend(zip(Qs, ys, [1.0] * len(Qs), step2_queries))
 
     print()
     print("Post-processing with Private-PGM, will take some time...")
+    # Private-PGM cannot be told which measurements are new, but when warm
+    # starting, the step 1 marginals have already converged, so the second
+    # call only needs half as many iterations to fit the step 3 measurements
+    if engine.warm_start:
+        engine.iters = max(engine.iters // 2, 1)
     model = engine.estimate(measurements)
     return model.synthetic_data()
 
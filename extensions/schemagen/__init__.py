@@ -20,6 +20,7 @@ methods.
 # Import things from the file to make it easier for importing code to use it
 
 from .schemagen import SchemaGenerator
+from .schemagen import read_csv_with_pyarrow
 from .schemagen import DEFAULT_MAX_VALUES_FOR_CATEGORICAL
 from .schemagen import DEFAULT_NUM_BINS
 from .schemagen import DEFAULT_INCLUDE_NA
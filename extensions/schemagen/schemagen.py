@@ -21,8 +21,19 @@ import os.path
 import json
 import math
 import logging
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
+from pandas.api.types import union_categoricals
 import numpy as np
+try:
+  import orjson
+except ImportError:
+  orjson = None
+try:
+  import pyarrow
+  import pyarrow.csv
+except ImportError:
+  pyarrow = None
 
 # Allow long lines in docs. pylint: disable=line-too-long
 DEFAULT_MAX_VALUES_FOR_CATEGORICAL = 40 #: *(default)* columns with fewer than this many values will be considered categorical
@@ -30,10 +41,158 @@ DEFAULT_NUM_BINS = 10 #: *(default)* informational "number of bins" into which a
 DEFAULT_INCLUDE_NA = False #: *(default)* whether or not to include NaN as a value for categorical fields
 DEFAULT_INCLUDE_TEXT = False #: *(default)* whether or not to include columns of kind "text" (non-categorical string columns)
 DEFAULT_PADDING_PERCENTAGE = 0.05
+DATE_PROBE_SIZE = 20 #: number of values parsed as dates before attempting to parse a whole column
+BOUNDED_UNIQUE_BLOCK_SIZE = 64 #: number of rows per allowed categorical value looked at before counting more of a string column
+CSV_CHUNK_SIZE = 1000000 #: number of rows read at a time when ``pyarrow`` isn't available
 NAME_FOR_PARAMETERS_FILE = "parameters.json"
 NAME_FOR_DATATYPES_FILE = "column_datatypes.json"
 # pylint: enable=line-too-long
 
+# The range of values each int datatype can hold, from smallest to largest
+_INT_RANGES = [(np.iinfo(dtype).min, np.iinfo(dtype).max, np.dtype(dtype).name)
+    for dtype in [np.uint8, np.int8, np.uint16, np.int16,
+        np.uint32, np.int32, np.uint64, np.int64]]
+
+def _get_int_dtype(series, fuzz_min_max):
+  """Finds the smallest int datatype that can hold the values of an int
+  column, and their min/max. See ``SchemaGenerator._get_series_dtype``."""
+  # If we believe the datatype is an int, we want to
+  # calculate min and max values and then figure out the
+  # smallest numpy int datatype that can store it, given the
+  # min and max values
+  min_value = series.min()
+  max_value = series.max()
+
+  if fuzz_min_max:
+    # Given these min and max values, "fuzz" them a little bit
+    # by adding / subtracting 5% of the difference between the two
+    # (rounded to the nearest int, because this is an int)
+    padding_margin = math.ceil((max_value - min_value) *
+          DEFAULT_PADDING_PERCENTAGE)
+    # Don't fuzz if min_value is equal to zero, because we'd unexpectedly
+    # be going negative on it
+    if min_value != 0:
+      min_value = min_value - padding_margin
+    max_value = max_value + padding_margin
+
+  # Now determine the smallest type that will work for both the min
+  # and the max value.
+  # NOTE (mch): I wasn't able to find a clever way to do this, so since
+  # we know it's an int, let's just try them all. (a trick like
+  # np.promote_types(np.min_scalar_type(min), np.min_scalar_type(max))
+  # won't work because if the min/max are something like -4/4,
+  # promote_types will give you an int16 instead of an int8, because
+  # you end up with promote_types(int8, uint8) which gives you an int16
+  # The ranges are precomputed, so this is just a few comparisons.
+  smallest_type = next((name for (low, high, name) in _INT_RANGES
+      if low <= min_value and max_value <= high), None)
+
+  if not smallest_type:
+    # Failsafe
+    smallest_type = (np.promote_types(np.min_scalar_type(min_value),
+        np.min_scalar_type(max_value))).name
+
+  # That's the type we'll put in the schema
+  return (smallest_type, min_value, max_value)
+
+def _get_float_dtype(series, fuzz_min_max):
+  """Finds the min/max of a float (or complex) column. See
+  ``SchemaGenerator._get_series_dtype``."""
+  # numpy dtypes will be `float32`/`float64`, but we just want `float`.
+  min_value = series.min()
+  max_value = series.max()
+
+  if fuzz_min_max:
+    # Given these min and max values, "fuzz" them a little bit
+    # by adding / subtracting 5% of the difference between the two
+    padding_margin = (max_value - min_value) * DEFAULT_PADDING_PERCENTAGE
+    min_value = min_value - padding_margin
+    max_value = max_value + padding_margin
+
+  return ("float", min_value, max_value)
+
+def _get_other_dtype(series, fuzz_min_max): # pylint: disable=unused-argument
+  """Decides whether a non-numeric column holds dates (and if so finds their
+  min/max) or strings. See ``SchemaGenerator._get_series_dtype``."""
+  # See if we can parse it as a date. Parsing a few values first is
+  # cheap, and if any of them is not a date then neither is the column,
+  # so free text doesn't pay for a parse of every value.
+  try:
+    pd.to_datetime(series.dropna().head(DATE_PROBE_SIZE))
+    dt = pd.to_datetime(series)
+  except: # Logging the full exception... pylint: disable=bare-except
+    # Default to it just being a string; min/max are just None
+    return ("str", None, None)
+
+  # It's a date; get min/max as dates, rounded to the nearest day
+  return ("date", str(dt.min().floor("D")), str(dt.max().ceil("D")))
+
+# How _get_series_dtype examines a column, by the kind of its numpy datatype
+_KIND_HANDLERS = {
+  "i": _get_int_dtype,
+  "u": _get_int_dtype,
+  "f": _get_float_dtype,
+  "c": _get_float_dtype,
+}
+
+def _json_bytes(content):
+  """Encodes content as JSON indented by two spaces, ending with a newline
+  (because POSIX). This uses ``orjson`` if it is installed, since it is much
+  faster than the standard library for schemas with many values. Note that
+  ``orjson`` writes ``NaN`` as ``null``.
+
+  :param: content the dict to encode
+  :type: dict
+
+  :return: the UTF-8 encoded JSON
+  :rtype: bytes
+  """
+  if orjson is None:
+    return (json.dumps(content, indent=2) + "\n").encode("utf-8")
+  return orjson.dumps(content,
+      option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE)
+
+def read_csv_with_pyarrow(input_csv_file):
+  # Allow long lines in docs, because params. pylint: disable=line-too-long
+  """Reads a CSV file with the multi-threaded ``pyarrow`` engine of
+  ``pandas.read_csv()``, if ``pyarrow`` is installed.
+
+  ``pyarrow`` parses ISO dates and times itself, and turning them back into
+  text wouldn't give what's in the file (e.g. ``2021-01-01T10:00:00`` would
+  come back as ``2021-01-01 10:00:00``), so those columns are read again as
+  the text in the file, which is what the default engine produces.
+
+  :param: input_csv_file the CSV file to read
+  :type: str
+
+  :return: the CSV file as a dataframe, or None if ``pyarrow`` isn't installed or can't parse the file (so that the default engine can report what's wrong with it)
+  :rtype: pandas.DataFrame
+  """
+  # pylint: enable=line-too-long
+  if pyarrow is None:
+    return None
+
+  try:
+    dataframe = pd.read_csv(input_csv_file, engine="pyarrow")
+
+    temporal_columns = [column for column in dataframe.columns
+        if dataframe[column].dtype.kind == "M" or
+        (dataframe[column].dtype.kind == "O" and pd.api.types.infer_dtype(
+            dataframe[column], skipna=True) in ["date", "time"])]
+    if temporal_columns:
+      table = pyarrow.csv.read_csv(input_csv_file,
+          convert_options=pyarrow.csv.ConvertOptions(
+              include_columns=temporal_columns,
+              column_types=dict.fromkeys(temporal_columns, pyarrow.string()),
+              strings_can_be_null=True))
+      for column in temporal_columns:
+        text = table.column(column).to_pandas()
+        dataframe[column] = text.where(text.notna(), np.nan).to_numpy()
+  except pyarrow.ArrowException:
+    return None
+
+  return dataframe
+
 class SchemaGenerator:
   # Allow long lines in docs, because URLs. pylint: disable=line-too-long
   """This is a schema generating class. It can be used to read an input
@@ -65,6 +224,12 @@ class SchemaGenerator:
     # Initialize class variables
     self._clear_class_variables()
 
+    # What has been worked out about the columns of the most recently parsed
+    # dataframe, if parse_dataframe was asked to keep it; it is reused when
+    # parsing the same dataframe again, so that only what depends on the new
+    # options has to be worked out
+    self._forget_summaries()
+
     # Set up a logger for this module
     self.log = logging.getLogger(__name__)
 
@@ -132,9 +297,9 @@ class SchemaGenerator:
 
     try:
       # Do the processing needed to generate the schema
+      self._prepare_summaries(self.input_data_as_dataframe)
       (self.output_schema, self.output_datatypes) = \
-            self._build_schema(
-                self.input_data_as_dataframe,
+            self._assemble_schema(
                 include_text_columns=include_text_columns,
                 skip_columns=skip_columns,
                 max_values_for_categorical=max_values_for_categorical,
@@ -150,6 +315,10 @@ class SchemaGenerator:
       self.log.exception("Caught an error when trying to parse schema:" )
       return False
 
+    finally:
+      # There's no reusing what's known about a file that was just read
+      self._forget_summaries()
+
     return True
 
   def parse_dataframe(self, input_dataframe,
@@ -158,7 +327,8 @@ class SchemaGenerator:
             num_bins = DEFAULT_NUM_BINS,
             include_na = DEFAULT_INCLUDE_NA,
             categorical_columns = None,
-            geographical_columns = None):
+            geographical_columns = None,
+            reuse_summaries = False):
     # Allow long lines in docs, because params. pylint: disable=line-too-long
     """This method will attempt to infer a schema from an already-loaded
     dataframe. If the SchemaGenerator has already been used to
@@ -167,6 +337,12 @@ class SchemaGenerator:
     reading in a new file). (If it is desirable to keep multiple schemae,
     a different SchemaGenerator should be used for each input file.)
 
+    With ``reuse_summaries``, what is worked out about the columns of the
+    dataframe is kept, and parsing the same dataframe again (e.g. with
+    different options) with ``reuse_summaries`` reuses it, rather than
+    examining all of the data again. The dataframe must not have been
+    modified in the meantime.
+
     Error-handling: This method will trap and log exceptions directly,
     and return a simple bool indicating success or failure.
 
@@ -186,6 +362,8 @@ class SchemaGenerator:
     :type categorical_columns: list
     :param geographical_columns: a list of names of columns to always treat as geographical (and therefore categorical), regardless of number of values
     :type geographical_columns: list
+    :param reuse_summaries: whether or not to keep what is worked out about the columns for parsing the same, unmodified dataframe again, and to reuse what was kept the last time
+    :type reuse_summaries: bool
 
     :return: whether or not the parsing was successful
     :rtype: bool
@@ -193,12 +371,14 @@ class SchemaGenerator:
     """
     self._clear_class_variables()
     self.input_data_as_dataframe = input_dataframe
+    if not reuse_summaries:
+      self._forget_summaries()
 
     try:
       # Do the processing needed to generate the schema
+      self._prepare_summaries(self.input_data_as_dataframe)
       (self.output_schema, self.output_datatypes) = \
-            self._build_schema(
-                self.input_data_as_dataframe,
+            self._assemble_schema(
                 include_text_columns=include_text_columns,
                 skip_columns=skip_columns,
                 max_values_for_categorical=max_values_for_categorical,
@@ -210,10 +390,15 @@ class SchemaGenerator:
     except: # Logging the full exception... pylint: disable=bare-except
       # Re-clear these variables to make sure nothing is in a half-loaded state
       self._clear_class_variables()
+      self._forget_summaries()
 
       self.log.exception("Caught an error when trying to parse schema:" )
       return False
 
+    finally:
+      if not reuse_summaries:
+        self._forget_summaries()
+
     return True
 
   def get_parameters_json(self):
@@ -270,9 +455,8 @@ class SchemaGenerator:
     self.log.info("Writing output parameters file %s...", output_file)
 
     try:
-      with open(output_file, "w", encoding="utf-8") as write_file:
-        json.dump(self.output_schema, write_file, indent=2)
-        write_file.write("\n") # Include a newline at the end because POSIX.
+      with open(output_file, "wb") as write_file:
+        write_file.write(_json_bytes(self.output_schema))
     except FileNotFoundError:
       self.log.error("Can't write to '%s'. Does the parent directory exist?",
                 output_file)
@@ -307,9 +491,8 @@ class SchemaGenerator:
     self.log.info("Writing output column datatypes file %s...", output_file)
 
     try:
-      with open(output_file, "w", encoding="utf-8") as write_file:
-        json.dump(self.output_datatypes, write_file, indent=2)
-        write_file.write("\n") # Include a newline at the end because POSIX.
+      with open(output_file, "wb") as write_file:
+        write_file.write(_json_bytes(self.output_datatypes))
     except FileNotFoundError:
       self.log.error("Can't write to '%s'. Does the parent directory exist?",
                 output_file)
@@ -333,6 +516,13 @@ class SchemaGenerator:
     self.input_data_as_dataframe = None
     self.input_csv_file = None
 
+  def _forget_summaries(self):
+    """This method drops what has been worked out about the columns of the
+    most recently parsed dataframe (and the reference to the dataframe).
+    """
+    self._summarized_dataframe = None
+    self._column_summaries = None
+
   def _load_csv(self, input_csv_file):
     # Allow long lines in docs, because params. pylint: disable=line-too-long
     """
@@ -354,7 +544,7 @@ class SchemaGenerator:
     # Read in the input file with pandas. If this fails,
     # throw an error and get out.
     try:
-      input_data_as_dataframe = pd.read_csv(input_csv_file)
+      input_data_as_dataframe = self._read_csv(input_csv_file)
     except pd.errors.ParserError as err:
       # This is likely to be a common error, so check for it explicitly
       self.log.error("Using input file: '%s', \
@@ -385,8 +575,111 @@ parse the input file using 'pandas.read_csv()'.", input_csv_file)
 
     return input_data_as_dataframe
 
+  def _read_csv(self, input_csv_file):
+    # Allow long lines in docs, because params. pylint: disable=line-too-long
+    """
+    Reads the CSV file with ``read_csv_with_pyarrow()``, falling back to the
+    default engine of ``pandas.read_csv()`` if ``pyarrow`` isn't installed or
+    can't parse the file.
+
+    :param input_csv_file: the CSV file that should be examined to determine the schema
+    :type input_csv_file: str
+
+    :return: The input CSV file as a dataframe (will raise exceptions if it encounters them)
+    :rtype: pandas.DataFrame
+    """
+    # pylint: enable=line-too-long
+    input_data_as_dataframe = read_csv_with_pyarrow(input_csv_file)
+    if input_data_as_dataframe is None:
+      self.log.info("pyarrow is not available or can't parse the file; \
+using the default CSV engine.")
+      return self._read_csv_in_chunks(input_csv_file)
+
+    return input_data_as_dataframe
+
+  def _read_csv_in_chunks(self, input_csv_file):
+    # Allow long lines in docs, because params. pylint: disable=line-too-long
+    """
+    Reads the CSV file with the default engine of ``pandas.read_csv()``,
+    ``CSV_CHUNK_SIZE`` rows at a time. The text columns of each chunk are
+    stored as categoricals before the next chunk is read, so a value that is
+    repeated throughout the file is only held in memory once.
+
+    As with the ``low_memory`` option of ``pandas.read_csv()``, the datatype of
+    each chunk is inferred separately, so a column whose chunks don't agree
+    ends up holding values of mixed types.
+
+    :param input_csv_file: the CSV file that should be examined to determine the schema
+    :type input_csv_file: str
+
+    :return: The input CSV file as a dataframe (will raise exceptions if it encounters them)
+    :rtype: pandas.DataFrame
+    """
+    # pylint: enable=line-too-long
+    chunks = []
+    for chunk in pd.read_csv(input_csv_file, chunksize=CSV_CHUNK_SIZE):
+      text_columns = chunk.select_dtypes(include="object").columns
+      chunks.append(chunk.astype(dict.fromkeys(text_columns, "category")))
+
+    if len(chunks) == 1:
+      return chunks[0]
+    if not chunks:
+      # Only a header; there's nothing to save memory on
+      return pd.read_csv(input_csv_file)
+
+    columns = {}
+    for column in chunks[0].columns:
+      parts = [chunk[column] for chunk in chunks]
+      if all(part.dtype.name == "category" for part in parts):
+        # Sort the combined categories, as reading the file in one go would
+        # have (unless they aren't sortable)
+        try:
+          combined = union_categoricals(parts, sort_categories=True,
+              ignore_order=True)
+        except TypeError:
+          combined = union_categoricals(parts, ignore_order=True)
+        columns[column] = pd.Series(combined)
+      else:
+        # Concatenating anything other than categoricals with the same
+        # categories turns them back into objects
+        columns[column] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(columns)
+
 
-  def _build_schema(self, input_data_as_dataframe,
+  def _prepare_summaries(self, input_data_as_dataframe):
+    # Allow long lines in docs, because params. pylint: disable=line-too-long
+    """This method sets up the summaries of the columns of the input dataset
+    that ``_assemble_schema`` builds the schema from. Everything about a
+    column that doesn't depend on the options of the schema (the datatype,
+    the number and list of unique values, etc.) is remembered in its summary
+    the first time it is needed, so none of it is worked out again if the
+    same dataframe is parsed again with different options.
+
+    :param input_data_as_dataframe: a pandas DataFrame that should be examined to determine the schema
+    :type input_data_as_dataframe: pandas.DataFrame
+    """
+    # pylint: enable=line-too-long
+    if input_data_as_dataframe is self._summarized_dataframe:
+      self.log.info("Reusing what is known about the columns of the dataframe")
+      return
+
+    # Ask pandas to figure out the best possible datatype based on the data,
+    # once for the whole dataframe rather than for each column
+    dataframe = input_data_as_dataframe.infer_objects()
+
+    # Count the NA values of every column in a single pass over the
+    # dataframe, so that only the columns that actually have some need to
+    # be copied without them
+    na_counts = dataframe.isna().sum()
+
+    # What's known about a column with and without its NA values is kept
+    # separately, by the value of include_na
+    self._column_summaries = {column: {"series": dataframe[column],
+        "na_count": na_count, "variants": {}}
+        for column, na_count in zip(dataframe.columns, na_counts)}
+    self._summarized_dataframe = input_data_as_dataframe
+
+  def _assemble_schema(self,
             include_text_columns = DEFAULT_INCLUDE_TEXT, skip_columns = None,
             max_values_for_categorical = DEFAULT_MAX_VALUES_FOR_CATEGORICAL,
             num_bins = DEFAULT_NUM_BINS,
@@ -395,7 +688,8 @@ parse the input file using 'pandas.read_csv()'.", input_csv_file)
             geographical_columns = None):
     # Allow long lines in docs, because params. pylint: disable=line-too-long
     """This method contains the business logic to build an appropriate
-    schema object based on the information from the input dataset. It uses
+    schema object based on the information from the input dataset, as
+    summarized by ``_prepare_summaries``. It uses
     numpy helper functions to figure out what the appropriate datatype should
     be, and uses pandas to determine unique values for categorical datatypes.
 
@@ -413,8 +707,6 @@ parse the input file using 'pandas.read_csv()'.", input_csv_file)
     we expect that most people who are using this module will also be using
     pandas, it seems reasonable to keep this behavior.
 
-    :param input_data_as_dataframe: a pandas DataFrame that should be examined to determine the schema
-    :type input_data_as_dataframe: pandas.DataFrame
     :param include_text_columns: whether or not to include columns that have a kind of "text" (non-categorical string fields)
     :type include_text_columns: bool
     :param skip_columns: a list of names of columns to skip completely
@@ -440,94 +732,196 @@ parse the input file using 'pandas.read_csv()'.", input_csv_file)
     else:
       self.log.info("Building schema without using NAs...")
 
-    if not categorical_columns:
-      categorical_columns = []
-    if not geographical_columns:
-      geographical_columns = []
-    if not skip_columns:
-      skip_columns = []
+    # Column names are looked up once per column, so keep them in sets
+    # rather than scanning the lists each time
+    categorical_columns = frozenset(categorical_columns or ())
+    geographical_columns = frozenset(geographical_columns or ())
+    skip_columns = frozenset(skip_columns or ())
 
     # Start the return value off with an empty schema structure
     output_schema = { "schema": {} }
     output_datatypes = { "dtype": {} }
 
-    # loop over each column, and add the values and the datatype to the dict
-    for column in input_data_as_dataframe.columns:
+    # Columns don't depend on each other, so build their schemas in
+    # parallel; pandas and numpy release the GIL for most of the work
+    columns = []
+    for column, summary in self._column_summaries.items():
       if column.strip(" ") in skip_columns:
         self.log.info("Skipping column %s as requested", column)
         continue
+      columns.append((column, summary))
+
+    with ThreadPoolExecutor() as executor:
+      col_schemas = list(executor.map(
+          lambda args: self._build_column_schema(*args,
+              include_text_columns=include_text_columns,
+              max_values_for_categorical=max_values_for_categorical,
+              num_bins=num_bins,
+              include_na=include_na,
+              categorical_columns=categorical_columns,
+              geographical_columns=geographical_columns),
+          columns))
 
-      # The actual values for the column
-      series = input_data_as_dataframe[column]
-      if not include_na:
-        self.log.info("Removing NA values from column %s", column)
-        series.dropna(inplace=True)
+    # loop over each column, and add the values and the datatype to the dict
+    for (column, _), col_schema in zip(columns, col_schemas):
+      if col_schema is None:
+        continue
+      output_schema["schema"][column] = col_schema
+      # Also add this column and its datatype to the output_datatypes dict
+      output_datatypes["dtype"][column] = col_schema["dtype"]
+
+    self.log.info("Schema building successful.")
+    return (output_schema, output_datatypes)
 
-      # Local variable to store the schema for this particular column
-      col_schema = {}
 
-      # Unique values for this column
-      values = pd.unique(series)
+  def _build_column_schema(self, column, summary,
+            include_text_columns = DEFAULT_INCLUDE_TEXT,
+            max_values_for_categorical = DEFAULT_MAX_VALUES_FOR_CATEGORICAL,
+            num_bins = DEFAULT_NUM_BINS,
+            include_na = DEFAULT_INCLUDE_NA,
+            categorical_columns = None,
+            geographical_columns = None):
+    # Allow long lines in docs, because params. pylint: disable=line-too-long
+    """This method builds the schema for a single column of the input dataset.
+    It is called by ``_assemble_schema`` for every column that isn't skipped,
+    possibly from several threads at once (but never twice at once for the
+    same column).
+
+    :param column: the name of the column
+    :type column: str
+    :param summary: the summary of the column from ``_prepare_summaries``, which is updated with anything that's worked out about the column
+    :type summary: dict
+    :param include_text_columns: whether or not to include columns that have a kind of "text" (non-categorical string fields)
+    :type include_text_columns: bool
+    :param max_values_for_categorical: columns with fewer than this many values will be considered categorical
+    :type max_values_for_categorical: number
+    :param num_bins: informational value to include in the output schema to indicate how many 'bins' should be used for numeric values
+    :type num_bins: number
+    :param include_na: whether or not to include ``NaN`` as a value for categorical fields
+    :type include_na: bool
+    :param categorical_columns: a list of names of columns to always treat as categorical, regardless of number of values
+    :type categorical_columns: frozenset
+    :param geographical_columns: a list of names of columns to always treat as geographical (and therefore categorical)
+    :type geographical_columns: frozenset
 
-      (datatype, min_value, max_value) = self._get_series_dtype(series)
-      col_schema["dtype"] = datatype
+    :return: the schema for the column, or None if the column should be left out
+    :rtype: dict
+    """
+    # pylint: enable=line-too-long
 
-      # Now, decide if this should be treated as a categorical value or
-      # something else, by checking to see how many unique values
-      # there are.
-      if column.strip(" ") in categorical_columns or \
-          column.strip(" ") in geographical_columns or \
-          len(values) <= max_values_for_categorical:
+    if not categorical_columns:
+      categorical_columns = frozenset()
+    if not geographical_columns:
+      geographical_columns = frozenset()
 
-        # Treat as a categorical value and output a list of unique values
-        if column in geographical_columns:
-          col_schema["kind"] = "geographical"
-        else:
-          col_schema["kind"] = "categorical"
+    variant = summary["variants"].get(include_na)
+    if variant is None:
+      series = summary["series"]
+      if not include_na and summary["na_count"] > 0:
+        self.log.info("Removing NA values from column %s", column)
+        series = series.dropna()
+      variant = summary["variants"][include_na] = {"series": series,
+          "dtypes": {}}
+    series = variant["series"]
+
+    # Now, decide if this should be treated as a categorical value or
+    # something else, by checking to see how many unique values
+    # there are.
+    stripped = column.strip(" ")
+    categorical = stripped in categorical_columns or \
+        stripped in geographical_columns or \
+        self._count_values(variant, include_na and summary["na_count"] > 0,
+            max_values_for_categorical) <= max_values_for_categorical
+
+    if categorical:
+      # Hash string columns only once, so that finding their unique values
+      # and datatype only has to look at the categories
+      if "category" not in variant:
+        variant["category"] = self._as_category(series)
+      series = variant["category"]
+
+    # Local variable to store the schema for this particular column
+    col_schema = {}
+
+    if categorical not in variant["dtypes"]:
+      variant["dtypes"][categorical] = self._get_series_dtype(series)
+    (datatype, min_value, max_value) = variant["dtypes"][categorical]
+    col_schema["dtype"] = datatype
+
+    if categorical:
+
+      # Treat as a categorical value and output a list of unique values
+      if column in geographical_columns:
+        col_schema["kind"] = "geographical"
+      else:
+        col_schema["kind"] = "categorical"
 
+      # The unique values only depend on include_na, so they are only found
+      # once for each setting
+      values = variant.get("values")
+      if values is None:
         # If we're including NA, it's frequently not going to be sortable,
-        # so don't even try
-        if not include_na:
+        # so don't even try; keep the values in order of appearance
+        if include_na:
+          if series.dtype.name == "category":
+            # The categories are already the unique values; taking them by
+            # the unique codes keeps them in order of appearance (-1 is NA)
+            values = np.asarray(pd.Categorical.from_codes(
+                pd.unique(series.cat.codes), dtype=series.dtype))
+          else:
+            values = pd.unique(series)
+        elif series.dtype.name == "category":
+          # The categories that are used are the unique values; they're
+          # already sorted unless the caller passed in a categorical with
+          # its own order, so sorting them is cheap
+          values = series.cat.categories.to_numpy()[
+              self._used_categories(series)]
           try:
-            values.sort()
+            values = np.sort(values)
           except: # Logging the full exception... pylint: disable=bare-except
             self.log.exception("Encountered an error when trying to sort the \
 values. Will include them without sorting.")
-        col_schema["values"] = values.tolist()
-        col_schema["codes"] = list(range(1, len(values)+1))
+        else:
+          # Find the unique values and sort them in one go
+          try:
+            values = np.unique(series.to_numpy())
+          except: # Logging the full exception... pylint: disable=bare-except
+            self.log.exception("Encountered an error when trying to sort the \
+values. Will include them without sorting.")
+            values = pd.unique(series)
+        variant["values"] = values
+      # Missing values are written as null (NaN isn't valid JSON)
+      col_schema["values"] = [None if pd.isna(value) else value
+          for value in values.tolist()]
+      col_schema["codes"] = np.arange(1, len(values) + 1).tolist()
 
-      else:
-        # Not categorical data
-        if col_schema["dtype"] == "str":
-          if not include_text_columns:
-            self.log.warning("Skipping '%s' because it is freetext", column)
-            col_schema = None
-            continue
-
-          self.log.warning("\nNot using values for column '%s' \
+    else:
+      # Not categorical data
+      if col_schema["dtype"] == "str":
+        if not include_text_columns:
+          self.log.warning("Skipping '%s' because it is freetext", column)
+          return None
+
+        self.log.warning("\nNot using values for column '%s' \
 because it is non-numeric and there are more than %s \
 unique values for it. This column will be labeled as a \
 'text' kind of string, and values will not be included.",
-              str(column), str(max_values_for_categorical))
-          col_schema["kind"] = "text"
-        elif col_schema["dtype"] == "date":
-          col_schema["kind"] = "date"
-          col_schema["min"] = min_value
-          col_schema["max"] = max_value
-        else:
-          # Treat it as a numeric value.
-          col_schema["kind"] = "numeric"
-          col_schema["min"] = min_value
-          col_schema["max"] = max_value
-          if num_bins > 0:
-            col_schema["bins"] = num_bins
-
-      output_schema["schema"][column] = col_schema
-      # Also add this column and its datatype to the output_datatypes dict
-      output_datatypes["dtype"][column] = col_schema["dtype"]
+            str(column), str(max_values_for_categorical))
+        col_schema["kind"] = "text"
+      elif col_schema["dtype"] == "date":
+        col_schema["kind"] = "date"
+        col_schema["min"] = min_value
+        col_schema["max"] = max_value
+      else:
+        # Treat it as a numeric value.
+        col_schema["kind"] = "numeric"
+        # Only box the numpy scalars into Python numbers for the output
+        col_schema["min"] = min_value.item()
+        col_schema["max"] = max_value.item()
+        if num_bins > 0:
+          col_schema["bins"] = num_bins
 
-    self.log.info("Schema building successful.")
-    return (output_schema, output_datatypes)
+    return col_schema
 
 
   def _get_series_dtype(self, series, fuzz_min_max=False):
@@ -543,86 +937,116 @@ unique values for it. This column will be labeled as a \
     :param: fuzz_min_max whether or not to adjust the min/max values for numeric by a percentage; defaults to False
     :type: boolean
 
-    :return: a tuple containing the string version of the datatype to use and, if relevant, min and max values
+    :return: a tuple containing the string version of the datatype to use and, if relevant, min and max values (as numpy scalars for numeric columns)
     :rtype: str
     """
     # pylint: enable=line-too-long
 
-    # default datatype value is "str" when all else fails
-    datatype = "str"
-    # default min/max are just None
-    min_value = None
-    max_value = None
-
-    # Ask pandas to figure out the best possible datatype based on the data
-    series = series.infer_objects()
-
-    if series.dtype.kind in ['i', 'u']: # pylint: disable=inconsistent-quotes
-      # If we believe the datatype is an int, we want to
-      # calculate min and max values and then figure out the
-      # smallest numpy int datatype that can store it, given the
-      # min and max values
-      min_value = series.min().item()
-      max_value = series.max().item()
-
-      if fuzz_min_max:
-        # Given these min and max values, "fuzz" them a little bit
-        # by adding / subtracting 5% of the difference between the two
-        # (rounded to the nearest int, because this is an int)
-        padding_margin = math.ceil((max_value - min_value) *
-              DEFAULT_PADDING_PERCENTAGE)
-        # Don't fuzz if min_value is equal to zero, because we'd unexpectedly
-        # be going negative on it
-        if min_value != 0:
-          min_value = min_value - padding_margin
-        max_value = max_value + padding_margin
-
-      # Now determine the smallest type that will work for both the min
-      # and the max value.
-      # NOTE (mch): I wasn't able to find a clever way to do this, so since
-      # we know it's an int, let's just try them all. (a trick like
-      # np.promote_types(np.min_scalar_type(min), np.min_scalar_type(max))
-      # won't work because if the min/max are something like -4/4,
-      # promote_types will give you an int16 instead of an int8, because
-      # you end up with promote_types(int8, uint8) which gives you an int16
-      for dtype in [np.uint8, np.int8, np.uint16, np.int16,
-              np.uint32, np.int32, np.uint64, np.int64]:
-        if np.can_cast(min_value, dtype) and np.can_cast(max_value, dtype):
-          smallest_type = dtype(0).dtype.name
-          break
-
-      if not smallest_type:
-        # Failsafe
-        smallest_type = (np.promote_types(np.min_scalar_type(min_value),
-            np.min_scalar_type(max_value))).name
-
-      # That's the type we'll put in the schema
-      datatype = smallest_type
-
-    elif series.dtype.kind in ['f', 'c']: # pylint: disable=inconsistent-quotes
-      # numpy dtypes will be `float32`/`float64`, but we just want `float`.
-      datatype = "float"
-      min_value = series.min().item()
-      max_value = series.max().item()
-
-      if fuzz_min_max:
-        # Given these min and max values, "fuzz" them a little bit
-        # by adding / subtracting 5% of the difference between the two
-        padding_margin = (max_value - min_value) * DEFAULT_PADDING_PERCENTAGE
-        min_value = min_value - padding_margin
-        max_value = max_value + padding_margin
+    if series.dtype.name == "category":
+      # Every value is one of the categories, so only those that are used
+      # need examining
+      series = pd.Series(series.cat.categories[self._used_categories(series)])
+
+    # Ask pandas to figure out the best possible datatype based on the data,
+    # if _prepare_summaries hasn't already (it can't have for the categories)
+    if series.dtype.kind == "O":
+      series = series.infer_objects()
 
+    # Look up how to examine the column by the kind of its datatype; anything
+    # that isn't numeric is either a date or a string
+    handler = _KIND_HANDLERS.get(series.dtype.kind, _get_other_dtype)
+    return handler(series, fuzz_min_max)
+
+  def _count_values(self, variant, count_na, cap):
+    # Allow long lines in docs, because params. pylint: disable=line-too-long
+    """
+    Counts the unique values of a column, remembering the count in its
+    summary. String columns are only counted until it's certain that there
+    are more than ``cap`` unique values, since they are frequently free text.
+
+    :param: variant the summary of the column for the current include_na setting
+    :type: dict
+    :param: count_na whether or not to count NaN as a value
+    :type: bool
+    :param: cap the largest number of unique values that needs to be known exactly
+    :type: int
+
+    :return: the number of unique values, or ``cap + 1`` if there are more than ``cap``
+    :rtype: int
+    """
+    # pylint: enable=line-too-long
+    if "nunique" in variant:
+      return variant["nunique"]
+    if variant.get("more_than", -1) >= cap:
+      return cap + 1
+
+    series = variant["series"]
+    if series.dtype == object:
+      values = self._bounded_unique(series.dropna().to_numpy(), cap)
+      if values is None:
+        variant["more_than"] = cap
+        return cap + 1
+      variant["nunique"] = len(values) + count_na
     else:
-      # See if we can parse it as a date
-      try:
-        dt = pd.to_datetime(series)
-        datatype = "date"
-      except: # Logging the full exception... pylint: disable=bare-except
-        # Default to it just being a string
-        datatype = "str"
-      else:
-        # It's a date; get min/max as dates, rounded to the nearest day
-        min_value = str(dt.min().floor("D"))
-        max_value = str(dt.max().ceil("D"))
+      variant["nunique"] = series.nunique(dropna=not count_na)
+    return variant["nunique"]
+
+  def _bounded_unique(self, values, cap):
+    """
+    Finds the unique values in an array, giving up as soon as there are more
+    than ``cap`` of them. For columns with many values this only has to look
+    at the first few rows, rather than hashing the whole column.
+
+    The values are hashed by ``pandas.unique()`` (in C) over a prefix of the
+    array that grows fourfold each time it still has few enough unique
+    values, so no more than about a third of the array is hashed twice.
+
+    :param: values an array of (non-NA) values
+    :type: numpy.ndarray
+    :param: cap the largest number of unique values worth collecting
+    :type: int
+
+    :return: the unique values in order of appearance, or None if there are more than ``cap``
+    :rtype: numpy.ndarray
+    """
+    size = BOUNDED_UNIQUE_BLOCK_SIZE * (cap + 1)
+    while True:
+      uniques = pd.unique(values[:size])
+      if len(uniques) > cap:
+        return None
+      if size >= len(values):
+        return uniques
+      size *= 4
+
+  def _as_category(self, series):
+    """
+    Converts a column of Python objects (typically strings) to the pandas
+    ``category`` dtype, so that it is hashed once and later scans can work
+    on the (few) categories and integer codes instead of the objects.
+    Other columns are returned unchanged.
+
+    :param: series a pandas series to convert
+    :type: pandas.series
 
-    return (datatype, min_value, max_value)
+    :return: the series, as a categorical if it held Python objects
+    :rtype: pandas.series
+    """
+    if series.dtype.kind == "O":
+      return series.astype("category")
+    return series
+
+  def _used_categories(self, series):
+    """
+    Finds which of the categories of a categorical column actually appear in
+    it; a categorical passed in by the caller may declare categories that
+    none of its rows have.
+
+    :param: series a categorical pandas series
+    :type: pandas.series
+
+    :return: a mask of the categories that are used
+    :rtype: numpy.ndarray
+    """
+    codes = series.cat.codes.to_numpy()
+    return np.bincount(codes[codes >= 0],
+        minlength=len(series.cat.categories)) > 0
@@ -13,14 +13,73 @@ def score(data, synth, targets=[]):
     :param targets: A list of columns in the data domain
     """
     workload = list(itertools.combinations(data.domain.invert(targets), 2)) 
+    # every marginal in the workload shares the target columns, so encode them
+    # once per dataset and only combine the pair of columns with them below
+    size = data.domain.size(targets)
+    t = encode(data, targets)
+    that = encode(synth, targets)
     errors = {}
     for a, b in workload:
         key = [a,b] + targets
-        xhat = synth.project(key).datavector()
-        x = data.project(key).datavector()
-        errors[tuple(key)] = 0.5*np.linalg.norm(x - xhat, 1) / data.records
+        # only the cells that occur in either dataset contribute to the error,
+        # so there is no need to materialize the dense marginals
+        xhat = counts(synth, combine(encode(synth, [a,b]), that, size))
+        x = counts(data, combine(encode(data, [a,b]), t, size))
+        x, xhat = x.align(xhat, fill_value=0)
+        diff = np.subtract(x.to_numpy(), xhat.to_numpy())
+        errors[tuple(key)] = 0.5*np.abs(diff, out=diff).sum() / data.records
     return pd.Series(errors).sort_values()
 
+def encode(dataset, cols):
+    """ Compute the flat index into the marginal on cols of every record,
+    so that grouping by the columns only has to hash a single integer.
+
+    :param dataset: an mbi.Dataset object
+    :param cols: A list of columns in the dataset domain
+    :returns: a numpy array with the cell of each record, or -1 for records
+        with a code outside of the domain (e.g. -1 for a missing value)
+    """
+    if len(cols) == 0:
+        return np.zeros(dataset.df.shape[0], dtype=np.int64)
+    values = dataset.df[list(cols)].to_numpy().T
+    shape = dataset.domain.project(cols).shape
+    valid = ((values >= 0) & (values < np.array(shape)[:, None])).all(axis=0)
+    if valid.all():
+        return np.ravel_multi_index(values, shape)
+    index = np.full(values.shape[1], -1, dtype=np.int64)
+    index[valid] = np.ravel_multi_index(values[:, valid], shape)
+    return index
+
+def combine(outer, inner, size):
+    """ Combine the flat indices of the records into two marginals into the
+    index into the marginal on the columns of both, keeping -1 for records
+    that are outside of the domain of either.
+
+    :param outer: the index into the marginal on the first columns
+    :param inner: the index into the marginal on the other columns
+    :param size: the size of the marginal on the other columns
+    :returns: a numpy array with the cell of each record
+    """
+    return np.where((outer >= 0) & (inner >= 0), outer*size + inner, -1)
+
+def counts(dataset, index):
+    """ Compute the (weighted) number of records in each cell of a marginal
+    that occurs in the dataset; records outside of the domain aren't counted,
+    as in Dataset.datavector.
+
+    :param dataset: an mbi.Dataset object
+    :param index: the flat index of the cell of each record, as given by encode
+    :returns: a pd.Series of counts indexed by the occurring cells
+    """
+    weights = dataset.weights
+    valid = index >= 0
+    if not valid.all():
+        index = index[valid]
+        weights = None if weights is None else weights[valid]
+    if weights is None:
+        return pd.Series(index).value_counts(sort=False)
+    return pd.Series(weights).groupby(index).sum()
+
    
 def default_params():
     """
@@ -1,59 +1,210 @@
 import numpy as np
 import pandas as pd
 import argparse
-from mbi import Domain, Dataset
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from numba import njit, prange
 import json
 
+@njit(parallel=True, cache=True, nogil=True)
+def bin_columns(x, edges, nedges, out):
+    """ Find the bin [edges[c, i], edges[c, i+1]) that each value of each column
+    x[c] falls in, binning the columns in parallel.
+
+    The bins are (close to) evenly spaced, apart from the first and last, so
+    the bin is first guessed directly from the value, and the guess is then
+    moved to the bin that actually contains it (usually it already does).
+    bin_codes in contest-submission/util.py does the same with numpy.
+
+    :param x: a (columns x records) float array of values
+    :param edges: the sorted edges of the bins of column c in edges[c, :nedges[c]]
+    :param nedges: the number of edges of each column
+    :param out: a (columns x records) int array that the bins are written to;
+        values below the first edge or at/above the last edge are put in the
+        first or last bin, and NaN in -1
+    """
+    for c in prange(x.shape[0]):
+        last = nedges[c] - 2
+        low = edges[c, 1]
+        high = edges[c, last]
+        scale = (last - 1) / (high - low) if last > 1 and high > low else 0.0
+        for i in range(x.shape[1]):
+            v = x[c, i]
+            if np.isnan(v):
+                out[c, i] = -1
+                continue
+            guess = (v - low) * scale + 1
+            k = 0 if guess < 0 else last if guess >= last else int(guess)
+            while k > 0 and v < edges[c, k]:
+                k -= 1
+            while k < last and v >= edges[c, k + 1]:
+                k += 1
+            out[c, i] = k
+
+def bin_edges(info):
+    """ Get the edges of the bins of a binned column.
+
+    :param info: the schema of the column
+    :returns: a read-only numpy array of the edges
+    """
+    return _bin_edges(info['min'], info['max'], info['bins'],
+            np.dtype(info['dtype']).str)
+
+def bin_midpoints(info):
+    """ Get the value that each bin of a binned column is mapped back to by
+    undo_discretize.
+
+    :param info: the schema of the column
+    :returns: a read-only numpy array of the midpoints, of the column's dtype
+    """
+    return _bin_midpoints(info['min'], info['max'], info['bins'],
+            np.dtype(info['dtype']).str)
+
+# columns with the same binning share these, across calls too
+
+@functools.lru_cache(maxsize=256)
+def _bin_edges(low, high, bins, dtype):
+    edges = np.linspace(low, high, num=bins+1).astype(dtype)
+    edges.setflags(write=False)
+    return edges
+
+@functools.lru_cache(maxsize=256)
+def _bin_midpoints(low, high, bins, dtype):
+    edges = _bin_edges(low, high, bins, dtype)
+    low = edges[:-1].copy()
+    high = edges[1:].copy()
+    low[0] = low[1]-2
+    high[-1] = high[-2]+2
+    # casting the few midpoints, rather than the column they are mapped to,
+    # means undo_discretize doesn't have to cast the column afterwards
+    mid = ((low + high) / 2).astype(dtype)
+    mid.setflags(write=False)
+    return mid
+
+def code_dtype(n):
+    """ Get the smallest signed int dtype that holds the codes 0 .. n-1, as
+    well as -1 for missing values (contest-submission/util.py has a copy) """
+    for dtype in (np.int8, np.int16, np.int32):
+        if n - 1 <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+@functools.lru_cache(maxsize=256)
+def values_index(values):
+    """ Build the lookup index of a list of values, cached so that its hash
+    table is shared between calls (contest-submission/util.py has a copy)
+
+    :param values: the list of values of a column, as a tuple
+    :returns: a pd.Index of the values
+    """
+    return pd.Index(list(values))
+
+def discretize_column(x, info):
+    """ Transform a column that isn't binned to codes.
+
+    :param x: the column, as a pd.Series
+    :param info: the schema of the column
+    :returns: the codes, and the size of the domain of the column
+    """
+    if 'values' in info:
+        # look the values up directly; anything else is coded -1
+        codes = values_index(tuple(info['values'])).get_indexer(x)
+        size = len(info['values'])
+        return codes.astype(code_dtype(size), copy=False), size
+    return x.to_numpy() - info['min'], info['max'] - info['min'] + 1
+
 def discretize(df, schema):
-    new = df.copy()
+    # collect the columns and build the data frame once at the end, rather
+    # than updating a copy of df one column at a time; columns that are not
+    # transformed are shared with df rather than copied
+    new = { }
     domain = { }
-    for col in new.columns:
+    binned = [ ]
+    others = [ ]
+    for col in df.columns:
         if col not in schema:
+            new[col] = df[col].to_numpy()
             continue
         info = schema[col]
         if 'bins' in info:
             # Things that should be binned are marked in the schema with
             # the number of bins into which to bin them; they will also
             # have min and max values.
-            bin_info = np.r_[np.linspace(info['min'], info['max'], num=info['bins'],
-                    endpoint=False).astype(info['dtype']), info['max']]
-
-            new[col] = pd.cut(df[col], bin_info, right=False).cat.codes
-            domain[col] = len(bin_info) - 1
-        elif 'values' in info:
-            new[col] = df[col].astype(pd.CategoricalDtype(info['values'])).cat.codes
-            domain[col] = len(info['values'])
+            edges = bin_edges(info)
+            binned.append((col, edges))
+            new[col] = None # filled in below, keeping the order of the columns
+            domain[col] = len(edges) - 1
         else:
-            new[col] = df[col] - info['min']
-            domain[col] = info['max'] - info['min'] + 1
-    return new, domain
+            others.append(col)
+            new[col] = domain[col] = None # also filled in below
+
+    # the other columns are independent of each other and of the binned ones,
+    # and numpy/pandas release the GIL for most of the work, so transform them
+    # in threads while the binned columns are binned
+    with ThreadPoolExecutor() as executor:
+        results = executor.map(
+                lambda col: discretize_column(df[col], schema[col]), others)
+
+        if binned:
+            # bin all of the columns at once, padding the shorter lists of edges
+            nedges = np.array([len(col_edges) for _, col_edges in binned])
+            edges = np.full((len(binned), nedges.max()), np.inf)
+            for c, (_, col_edges) in enumerate(binned):
+                edges[c, :len(col_edges)] = col_edges
+            x = np.ascontiguousarray(
+                    df[[col for col, _ in binned]].to_numpy(np.float64).T)
+            codes = np.empty(x.shape, dtype=np.int64)
+            bin_columns(x, edges, nedges, codes)
+            for c, (col, _) in enumerate(binned):
+                new[col] = codes[c].astype(code_dtype(domain[col]), copy=False)
+
+        for col, (codes, size) in zip(others, results):
+            new[col] = codes
+            domain[col] = size
+
+    return pd.DataFrame(new, index=df.index, copy=False), domain
 
 def undo_discretize(df, schema):
-    new = df.copy()
+    new = { col : df[col].to_numpy() for col in df.columns }
 
     for col in schema.keys():
         info = schema[col]
         if 'bins' in info:
             # Things that should be binned are marked in the schema with
             # the number of bins into which to bin them; they will also
-            # have min and max values.
-            bin_info = np.r_[np.linspace(info['min'], info['max'], num=info['bins'],
-                    endpoint=False).astype(info['dtype']), info['max']]
-            low = bin_info[:-1];
-            high = bin_info[1:]
-            low[0] = low[1]-2
-            high[-1] = high[-2]+2
-            mid = (low + high) / 2
-            new[col] = mid[df[col].values]
+            # have min and max values.  Codes outside of the domain are
+            # clipped to it, so the gather needs no bounds checks.
+            new[col] = np.take(bin_midpoints(info), df[col].to_numpy(),
+                    mode='clip')
         elif 'values' in info:
             mapping = np.array(info['values'])
-            new[col] = mapping[df[col].values]
+            new[col] = np.take(mapping, df[col].to_numpy(), mode='clip')
         else:
-            new[col] = df[col] + info['min']
+            new[col] = df[col].to_numpy() + info['min']
 
     dtypes = { col : schema[col]['dtype'] for col in schema }
 
-    return new.astype(dtypes)
+    # binned columns already have their dtype, so only the others are cast
+    return pd.DataFrame(new, index=df.index, copy=False).astype(dtypes, copy=False)
+
+def read_csv(path):
+    """ Read a CSV file with read_csv_with_pyarrow from the schema generator,
+    which keeps dates and times as the text in the file, like the schema
+    values are; the default engine of pd.read_csv is used if the schema
+    generator or pyarrow isn't available, or pyarrow can't parse the file.
+
+    :param path: path to the CSV file
+    :returns: the data frame, with numpy dtypes either way
+    """
+    try:
+        # only needed here, so transform doesn't depend on the schema generator
+        from schemagen import read_csv_with_pyarrow
+    except ImportError:
+        return pd.read_csv(path)
+    df = read_csv_with_pyarrow(path)
+    if df is None:
+        return pd.read_csv(path)
+    return df
 
 if __name__ == "__main__":
     description = "Pre and post processing functions for the Adagrid mechanism"
@@ -80,7 +231,7 @@ if __name__ == "__main__":
 
     transform = args.transform
     output_dir = args.output_dir
-    df = pd.read_csv(args.df)
+    df = read_csv(args.df)
     with open(args.schema) as f:
         schemagen = json.load(f)
         schema = schemagen["schema"]
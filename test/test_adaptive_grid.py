@@ -0,0 +1,35 @@
+"""Test methods for the helper functions
+from adaptive_grid.py.
+
+  Typical usage example:
+
+  python -m unittest
+
+  or
+
+  python -m unittest -k test_adaptive_grid
+"""
+import unittest
+import numpy as np
+
+from adaptive_grid import marginal
+
+class TestAdaptiveGrid(unittest.TestCase):
+  """Test class for the Adagrid helper functions
+  """
+
+  def test_marginal_out_of_domain(self):
+    """
+    Test that records with a code outside of the domain (like -1 for a
+    missing value) aren't counted in the marginals
+    """
+    records = np.array([[0, 1], [2, 3], [-1, 0], [0, 4]])
+    weights = np.array([0.5, 2.0, 1.0, 1.0])
+
+    expected = np.zeros(12)
+    expected[[1, 11]] = 1
+    np.testing.assert_array_equal(marginal(records, None, (0, 1), (3, 4)),
+        expected)
+    expected[[1, 11]] = [0.5, 2.0]
+    np.testing.assert_array_equal(marginal(records, weights, (0, 1), (3, 4)),
+        expected)
@@ -15,7 +15,7 @@ import numpy as np
 import pandas as pd
 import json
 
-from util import discretize, undo_discretize, score
+from util import discretize, undo_discretize, score, code_dtype, MIDPOINTS
 from mbi import Domain, Dataset
 from schemagen import SchemaGenerator
 
@@ -61,3 +61,53 @@ class TestDiscretization(unittest.TestCase):
 
     # Visually compare the original with the discretized / undiscretized
     undiscretized_dataset.to_csv("result.csv", index=False)
+
+  def test_discretize_out_of_range(self):
+    """
+    Test that binned values outside of the bins are put in the first or last
+    bin, and that missing or unknown values are coded -1
+    """
+    dataframe = pd.DataFrame({
+        "fare": [-5.0, 15.0, 20000.0, np.nan],
+        "company": ["b", "a", "c", "b"]
+    })
+    schema = {
+        "fare": {"dtype": "float64", "kind": "numeric", "min": 0, "max": 9900, "bins": 11},
+        "company": {"dtype": "str", "kind": "categorical", "values": ["a", "b"]}
+    }
+    mbi_dataset = discretize(dataframe, schema)
+
+    self.assertEqual(mbi_dataset.df["fare"].tolist(), [0, 2, 10, -1])
+    self.assertEqual(mbi_dataset.df["company"].tolist(), [1, 0, -1, 1])
+
+  def test_undo_discretize_missing(self):
+    """
+    Test that codes of -1 are mapped back to the first value or bin
+    """
+    schema = {
+        "fare": {"dtype": "float64", "kind": "numeric", "min": 0, "max": 9900, "bins": 11},
+        "company": {"dtype": "str", "kind": "categorical", "values": ["a", "b"]}
+    }
+    domain = Domain.fromdict({"fare": 11, "company": 2})
+    mbi_dataset = Dataset(pd.DataFrame({"fare": [-1, 10], "company": [-1, 1]}), domain)
+    undiscretized_dataset = undo_discretize(mbi_dataset, schema)
+
+    self.assertEqual(undiscretized_dataset["fare"].tolist(),
+        [MIDPOINTS["fare"][0], MIDPOINTS["fare"][-1]])
+    self.assertEqual(undiscretized_dataset["company"].tolist(), ["a", "b"])
+
+  def test_code_dtype(self):
+    """
+    Test that codes are stored in the smallest signed int dtype that also
+    holds -1
+    """
+    self.assertEqual(code_dtype(2), np.int8)
+    self.assertEqual(code_dtype(128), np.int8)
+    self.assertEqual(code_dtype(129), np.int16)
+    self.assertEqual(code_dtype(40000), np.int32)
+    self.assertEqual(code_dtype(2**32), np.int64)
+
+    dataframe = pd.DataFrame({"company": ["b", "a", "c"]})
+    schema = {"company": {"dtype": "str", "kind": "categorical", "values": ["a", "b"]}}
+    mbi_dataset = discretize(dataframe, schema)
+    self.assertEqual(mbi_dataset.df["company"].dtype, np.int8)
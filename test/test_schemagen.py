@@ -0,0 +1,114 @@
+"""Test methods for the SchemaGenerator class
+from schemagen.py.
+
+  Typical usage example:
+
+  python -m unittest
+
+  or
+
+  python -m unittest -k test_schemagen
+"""
+import unittest
+import unittest.mock
+import os
+import tempfile
+import pandas as pd
+
+from schemagen import SchemaGenerator
+
+class TestSchemaGenerator(unittest.TestCase):
+  """Test class for the schema generator
+  """
+
+  def setUp(self):
+    # A small CSV file, written to a fresh temporary directory
+    self.directory = tempfile.TemporaryDirectory()
+    self.csv_file = os.path.join(self.directory.name, "input.csv")
+    pd.DataFrame({
+        "name": ["zeta", "beta", "zeta", "alpha", "gamma", "delta", "beta"],
+        "number": [3, 1, 2, 3, 1, 2, 3]
+    }).to_csv(self.csv_file, index=False)
+
+  def tearDown(self):
+    self.directory.cleanup()
+
+  def test_read_csv_in_chunks(self):
+    """
+    Test that reading the file a few rows at a time gives the same values
+    as reading it in one go
+    """
+    with unittest.mock.patch("schemagen.schemagen.CSV_CHUNK_SIZE", 2):
+      dataframe = SchemaGenerator()._read_csv_in_chunks(self.csv_file)
+    schema_gen = SchemaGenerator()
+    self.assertTrue(schema_gen.parse_dataframe(dataframe))
+    schema = schema_gen.get_parameters_json()["schema"]
+
+    self.assertEqual(schema["name"]["values"],
+        ["alpha", "beta", "delta", "gamma", "zeta"])
+    self.assertEqual(schema["number"]["values"], [1, 2, 3])
+
+  def test_unused_categories(self):
+    """
+    Test that categories that no row has aren't included in the values
+    """
+    dataframe = pd.DataFrame({"letter": pd.Categorical(["b", "a", "b"],
+        categories=["z", "b", "a", "q"])})
+    schema_gen = SchemaGenerator()
+    self.assertTrue(schema_gen.parse_dataframe(dataframe))
+    schema = schema_gen.get_parameters_json()["schema"]
+
+    self.assertEqual(schema["letter"]["values"], ["a", "b"])
+
+  def test_unused_categories_dtype(self):
+    """
+    Test that categories that no row has don't change the datatype or the
+    min/max of a column
+    """
+    dataframe = pd.DataFrame({"number": pd.Categorical([1, 2, 1],
+        categories=[1, 2, 300])})
+    schema_gen = SchemaGenerator()
+    self.assertTrue(schema_gen.parse_dataframe(dataframe,
+        max_values_for_categorical=1))
+    schema = schema_gen.get_parameters_json()["schema"]
+
+    self.assertEqual(schema["number"]["dtype"], "uint8")
+    self.assertEqual(schema["number"]["max"], 2)
+
+  def test_parse_modified_dataframe(self):
+    """
+    Test that parsing a dataframe again after modifying it gives the schema
+    of the modified dataframe, unless the summaries are reused
+    """
+    dataframe = pd.DataFrame({"number": [1, 2, 3]})
+    schema_gen = SchemaGenerator()
+    self.assertTrue(schema_gen.parse_dataframe(dataframe))
+    dataframe.loc[0, "number"] = 100
+    self.assertTrue(schema_gen.parse_dataframe(dataframe))
+    schema = schema_gen.get_parameters_json()["schema"]
+    self.assertEqual(schema["number"]["values"], [2, 3, 100])
+
+    # Reusing the summaries of an unmodified dataframe gives the same schema
+    self.assertTrue(schema_gen.parse_dataframe(dataframe,
+        reuse_summaries=True))
+    self.assertTrue(schema_gen.parse_dataframe(dataframe, num_bins=5,
+        reuse_summaries=True))
+    self.assertEqual(schema_gen.get_parameters_json()["schema"], schema)
+
+  def test_categorical_order(self):
+    """
+    Test that the values of a categorical with its own order of categories
+    are sorted, and that missing values are written as null
+    """
+    dataframe = pd.DataFrame({
+        "letter": pd.Categorical(["b", "a", "c"], categories=["c", "b", "a"]),
+        "name": ["x", None, "y"]
+    })
+    schema_gen = SchemaGenerator()
+    self.assertTrue(schema_gen.parse_dataframe(dataframe, include_na=True))
+    schema = schema_gen.get_parameters_json()["schema"]
+    self.assertEqual(schema["name"]["values"], ["x", None, "y"])
+
+    self.assertTrue(schema_gen.parse_dataframe(dataframe))
+    schema = schema_gen.get_parameters_json()["schema"]
+    self.assertEqual(schema["letter"]["values"], ["a", "b", "c"])
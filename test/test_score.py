@@ -0,0 +1,46 @@
+"""Test methods for the score method
+from score.py.
+
+  Typical usage example:
+
+  python -m unittest
+
+  or
+
+  python -m unittest -k test_score
+"""
+import unittest
+import numpy as np
+import pandas as pd
+
+from score import score
+from mbi import Domain, Dataset
+
+class TestScore(unittest.TestCase):
+  """Test class for the scoring method
+  """
+
+  def test_score_out_of_domain(self):
+    """
+    Test that records with a code outside of the domain (like -1 for a
+    missing value) aren't counted in the marginals, with or without targets
+    """
+    domain = Domain.fromdict({"a": 2, "b": 2, "c": 2})
+    data = Dataset(pd.DataFrame({
+        "a": [0, 1, 1, 0],
+        "b": [0, 1, -1, 1],
+        "c": [1, 1, 0, -1]
+    }), domain)
+    synth = Dataset(pd.DataFrame({
+        "a": [0, 1, -1],
+        "b": [0, 1, 0],
+        "c": [1, 1, 0]
+    }), domain)
+
+    errors = score(data, synth)
+    self.assertAlmostEqual(errors[("a", "b")], 0.125)
+    self.assertAlmostEqual(errors[("a", "c")], 0.125)
+    self.assertAlmostEqual(errors[("b", "c")], 0.125)
+
+    errors = score(data, synth, ["c"])
+    self.assertAlmostEqual(errors[("a", "b", "c")], 0.0)